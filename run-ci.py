@@ -1,52 +1,185 @@
-from typing import Any, Callable, cast
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    cast,
+)
 import argparse
+import concurrent.futures
+import functools
+import hashlib
 import os
 from pathlib import Path
 import re
 import shutil
+import subprocess
 import sys
+import threading
 import time
 import json
 
 import cli_ui as ui
-import psutil
 
 import tankerci
-import tankerci.conan
+import tankerci.bump
+import tankerci.git
 import tankerci.js
 import tankerci.reporting
 
+if TYPE_CHECKING:
+    # psutil is only imported by the commands killing processes
+    import psutil
+
+
+KARMA_PORT = 9876
+
+_IE_DB_PATH = Path(
+    r"%s\Microsoft\Internet Explorer\Indexed DB" % os.environ.get("LOCALAPPDATA")
+)
+_SAFARI_USER_PATH = Path(r"~/Library/Safari").expanduser()
+
+_NIGHTLY_LOGS_PATH = Path("nightly-logs")
+
+_PACKAGES_DIR = "packages"
+_PACKAGE_RE = re.compile(r"^@tanker/(?:(datastore|stream)-)?(.*)$")
+_PRERELEASE_RE = re.compile(r"(alpha|beta)")
+
 
 class TestFailed(Exception):
     pass
 
 
-def find_procs_by_name(name: str) -> psutil.Process:
+def wait_for_futures(futures: List[concurrent.futures.Future]) -> None:
+    for future in concurrent.futures.as_completed(futures):
+        future.result()
+
+
+def _snapshot_processes() -> Iterator[Tuple[int, str]]:
+    "Yield (pid, executable name) for every process from one Toolhelp32 snapshot."
+    import ctypes
+    from ctypes import wintypes
+
+    class PROCESSENTRY32W(ctypes.Structure):
+        _fields_ = [
+            ("dwSize", wintypes.DWORD),
+            ("cntUsage", wintypes.DWORD),
+            ("th32ProcessID", wintypes.DWORD),
+            ("th32DefaultHeapID", ctypes.c_size_t),
+            ("th32ModuleID", wintypes.DWORD),
+            ("cntThreads", wintypes.DWORD),
+            ("th32ParentProcessID", wintypes.DWORD),
+            ("pcPriClassBase", wintypes.LONG),
+            ("dwFlags", wintypes.DWORD),
+            ("szExeFile", wintypes.WCHAR * 260),
+        ]
+
+    TH32CS_SNAPPROCESS = 0x00000002
+    kernel32 = ctypes.WinDLL("kernel32", use_last_error=True)  # type: ignore
+    kernel32.CreateToolhelp32Snapshot.restype = wintypes.HANDLE
+    kernel32.CreateToolhelp32Snapshot.argtypes = [wintypes.DWORD, wintypes.DWORD]
+    kernel32.Process32FirstW.argtypes = [
+        wintypes.HANDLE,
+        ctypes.POINTER(PROCESSENTRY32W),
+    ]
+    kernel32.Process32NextW.argtypes = kernel32.Process32FirstW.argtypes
+    kernel32.CloseHandle.argtypes = [wintypes.HANDLE]
+
+    snapshot = kernel32.CreateToolhelp32Snapshot(TH32CS_SNAPPROCESS, 0)
+    if snapshot == wintypes.HANDLE(-1).value:
+        raise ctypes.WinError(ctypes.get_last_error())  # type: ignore
+    try:
+        entry = PROCESSENTRY32W()
+        entry.dwSize = ctypes.sizeof(PROCESSENTRY32W)
+        ok = kernel32.Process32FirstW(snapshot, ctypes.byref(entry))
+        while ok:
+            yield entry.th32ProcessID, entry.szExeFile
+            ok = kernel32.Process32NextW(snapshot, ctypes.byref(entry))
+    finally:
+        kernel32.CloseHandle(snapshot)
+
+
+def _find_procs_in_snapshot(names: Set[str]) -> Dict[str, List["psutil.Process"]]:
+    import psutil
+
+    # The snapshot already holds every executable name, so no process has to be
+    # opened to be matched, and cmdline is never needed for .exe targets
+    by_lower_name = {name.lower(): name for name in names}
+    found: Dict[str, List["psutil.Process"]] = {name: [] for name in names}
+    for pid, exe_name in _snapshot_processes():
+        name = by_lower_name.get(exe_name.lower())
+        if not name:
+            continue
+        try:
+            found[name].append(psutil.Process(pid))
+        except psutil.NoSuchProcess:
+            continue
+    return found
+
+
+def find_procs_by_names(names: Set[str]) -> Dict[str, List["psutil.Process"]]:
+    "Return the processes matching any of 'names', grouped by name."
+    if sys.platform == "win32":
+        return _find_procs_in_snapshot(names)
+    import psutil
+
+    found: Dict[str, List["psutil.Process"]] = {name: [] for name in names}
+    # Iterate over raw pids: process_iter() does a pid reuse check for every
+    # process, which we don't need before a name lookup
+    for pid in psutil.pids():
+        try:
+            p = psutil.Process(pid)
+            # Batch the backend reads needed for name and exe
+            with p.oneshot():
+                name = p.name()
+                if name not in found:
+                    # exe is much slower to get than the name, only look at it
+                    # when the name did not match
+                    exe = p.exe()
+                    name = exe and os.path.basename(exe)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            continue
+        if name in found:
+            found[name].append(p)
+    return found
+
+
+def find_procs_by_name(name: str) -> List["psutil.Process"]:
     "Return a list of processes matching 'name'."
-    ls = []
-    for p in psutil.process_iter(attrs=["name", "exe", "cmdline"]):
-        if (
-            name == p.info["name"]
-            or p.info["exe"]
-            and os.path.basename(p.info["exe"]) == name
-            or p.info["cmdline"]
-            and p.info["cmdline"][0] == name
-        ):
-            ls.append(p)
-    return ls
-
-
-def kill_windows_process_if_running(name: str) -> None:
-    processes = find_procs_by_name(name)
+    return find_procs_by_names({name})[name]
+
+
+def kill_processes(processes: List["psutil.Process"]) -> None:
+    import psutil
+
+    killed = []
     for p in processes:
-        p.kill()
-    psutil.wait_procs(processes)
+        try:
+            p.kill()
+        except psutil.NoSuchProcess:
+            continue  # already gone
+        except psutil.AccessDenied:
+            ui.warning(f"Not allowed to kill process {p.pid}")
+            continue
+        killed.append(p)
+    # Never block forever on a process stuck in the kernel
+    _, alive = psutil.wait_procs(killed, timeout=3)
+    for p in alive:
+        ui.warning(f"Process {p.pid} is still running after being killed")
+
+
+def kill_processes_by_names(names: Set[str]) -> None:
+    found = find_procs_by_names(names)
+    kill_processes([p for processes in found.values() for p in processes])
 
 
 def kill_windows_processes() -> None:
-    kill_windows_process_if_running("msedge.exe")
-    kill_windows_process_if_running("iexplore.exe")
-    kill_windows_process_if_running("dllhost.exe")
+    kill_processes_by_names({"msedge.exe", "iexplore.exe", "dllhost.exe"})
 
 
 def onerror(navigator: str) -> Callable[..., None]:
@@ -56,16 +189,27 @@ def onerror(navigator: str) -> Callable[..., None]:
             f"unable to delete path: {path}\n",
             f"error: {e}",
         )
-        shutil.rmtree(path, ignore_errors=True)
 
     return fcn
 
 
+def fast_rmtree(path: Path, onerror: Optional[Callable[..., None]] = None) -> None:
+    "Remove 'path' recursively using the platform's native command."
+    if os.name == "nt":
+        cmd = ["cmd", "/c", "rmdir", "/s", "/q", str(path)]
+    else:
+        cmd = ["rm", "-rf", str(path)]
+    subprocess.run(cmd, check=False)
+    if path.exists():
+        # shutil.rmtree doesn't follow directory symlinks nor NTFS junctions
+        shutil.rmtree(path, onerror=onerror)
+
+
 def delete_ie_state() -> None:
+    import psutil
+
     kill_windows_processes()
-    localappdata = os.environ.get("LOCALAPPDATA")
-    ie_db_path = Path(r"%s\Microsoft\Internet Explorer\Indexed DB" % localappdata)
-    shutil.rmtree(ie_db_path, onerror=onerror("IE"))
+    fast_rmtree(_IE_DB_PATH, onerror=onerror("IE"))
 
     """
     This magic value is the combination of the following bitflags:
@@ -81,36 +225,104 @@ def delete_ie_state() -> None:
 
     Total: 511
     """
-    tankerci.run("RunDll32.exe", "InetCpl.cpl,ClearMyTracksByProcess", "511")
-    time.sleep(5)
+    clear_cmd = ["RunDll32.exe", "InetCpl.cpl,ClearMyTracksByProcess", "511"]
+    ui.info("$", *clear_cmd)
+    started = time.time()
+    # One deadline for RunDll32 and for the processes it hands over to
+    deadline = started + 10
+    clear_process = subprocess.Popen(clear_cmd, stdout=subprocess.DEVNULL)
+    try:
+        clear_process.wait(timeout=deadline - time.time())
+    except subprocess.TimeoutExpired:
+        ui.warning(f"{' '.join(clear_cmd)} timed out, killing it")
+        clear_process.kill()
+        clear_process.wait()
+    else:
+        if clear_process.returncode != 0:
+            ui.fatal(
+                f"{' '.join(clear_cmd)} failed with code {clear_process.returncode}"
+            )
+    # The clearing can be handed over to other RunDll32 processes, only wait
+    # for those started by our own, not for unrelated system instances
+    handed_over = []
+    for p in find_procs_by_name("rundll32.exe"):
+        try:
+            if p.create_time() >= started:
+                handed_over.append(p)
+        except (psutil.NoSuchProcess, psutil.AccessDenied):
+            pass
+    _, alive = psutil.wait_procs(handed_over, timeout=max(0.0, deadline - time.time()))
+    if alive:
+        ui.warning("IE state is still being cleared, going on anyway")
 
 
 def delete_safari_state() -> None:
-    safari_user_path = Path(r"~/Library/Safari").expanduser()
-    if safari_user_path.exists():
-        shutil.rmtree(safari_user_path)
-
-
-def run_tests_in_browser_ten_times(*, runner: str) -> None:
-    failures = list()
-    for i in range(1, 11):
-        print("\n" + "-" * 80 + "\n")
-        print("Running tests round", i)
-        print("-" * 80, end="\n\n")
+    if _SAFARI_USER_PATH.exists():
+        fast_rmtree(_SAFARI_USER_PATH)
+
+
+def print_round_banner(i: int) -> None:
+    print("\n" + "-" * 80 + "\n")
+    print("Running tests round", i)
+    print("-" * 80, end="\n\n")
+
+
+def run_tests_in_browser_ten_times(*, runner: str, parallel_rounds: int) -> None:
+    rounds = range(1, 11)
+    # Each linux round starts its own headless Chrome, so rounds can run side
+    # by side as long as each karma server listens on its own port. Safari,
+    # Edge and IE state is shared by the whole host.
+    parallel = runner == "linux" and parallel_rounds > 1
+    output_lock = threading.Lock()
+
+    def run_round(i: int) -> None:
+        if not parallel:
+            print_round_banner(i)
+            run_tests_in_browser(runner=runner, port=KARMA_PORT + i)
+            return
+        # Keep the output of concurrent rounds apart. yarn writes straight to
+        # the round's log file, so nothing is lost if the job times out, and
+        # the log is printed with its banner once the round is over.
+        log_path = _NIGHTLY_LOGS_PATH / f"round-{i}.log"
         try:
-            run_tests_in_browser(runner=runner)
-        except (Exception, SystemExit):
-            failures.append(i)
+            with log_path.open("w") as log:
+                tankerci.run(
+                    "yarn",
+                    *linux_karma_args(port=KARMA_PORT + i),
+                    stdout=log,
+                    stderr=subprocess.STDOUT,
+                )
+        finally:
+            with output_lock:
+                print_round_banner(i)
+                print(log_path.read_text(errors="replace"), flush=True)
+
+    if parallel:
+        _NIGHTLY_LOGS_PATH.mkdir(exist_ok=True)
+    failures = list()
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=parallel_rounds if parallel else 1
+    ) as executor:
+        futures = {executor.submit(run_round, i): i for i in rounds}
+        for future in concurrent.futures.as_completed(futures):
+            try:
+                future.result()
+            except (Exception, SystemExit):
+                failures.append(futures[future])
 
     if failures:
         print("Tests failed")
-        print("Failed rounds:", repr(failures))
+        print("Failed rounds:", repr(sorted(failures)))
         raise TestFailed
 
 
-def run_tests_in_browser(*, runner: str) -> None:
+def linux_karma_args(*, port: int) -> List[str]:
+    return ["karma", "--browsers", "ChromeInDocker", "--port", str(port)]
+
+
+def run_tests_in_browser(*, runner: str, port: int = KARMA_PORT) -> None:
     if runner == "linux":
-        tankerci.js.run_yarn("karma", "--browsers", "ChromeInDocker")
+        tankerci.js.run_yarn(*linux_karma_args(port=port))
     elif runner == "macos":
         tankerci.run("killall", "Safari", check=False)
         delete_safari_state()
@@ -123,32 +335,62 @@ def run_tests_in_browser(*, runner: str) -> None:
         tankerci.js.run_yarn("karma", "--browsers", "IE")
 
 
+def _install_hash(cwd: Path) -> str:
+    "Hash the files deciding what yarn installs in 'cwd'."
+    manifest = cwd / "package.json"
+    workspaces = json.loads(manifest.read_bytes()).get("workspaces", [])
+    if isinstance(workspaces, dict):
+        workspaces = workspaces.get("packages", [])
+    # Workspace manifests declare dependencies too, and yarn links the
+    # workspaces themselves, which yarn.lock doesn't record
+    files = [cwd / "yarn.lock", manifest]
+    for pattern in workspaces:
+        files.extend(sorted(cwd.glob(f"{pattern}/package.json")))
+    h = hashlib.sha256()
+    for path in files:
+        h.update(str(path.relative_to(cwd)).encode())
+        h.update(path.read_bytes())
+    # Skipping yarn also skips its .yarn-integrity check, so native modules
+    # must be reinstalled when the platform or node's ABI changes
+    _, node_version = tankerci.run_captured("node", "--version")
+    h.update(f"{sys.platform} {node_version}".encode())
+    return h.hexdigest()
+
+
+def yarn_install_deps(cwd: Optional[Path] = None) -> None:
+    "Install node dependencies, unless they are already up to date."
+    cwd = cwd or Path.cwd()
+    install_hash = _install_hash(cwd)
+    # Stamped after each successful install, so that later commands run on
+    # the same checkout don't install everything again
+    stamp = cwd / "node_modules" / ".tanker-install-lockhash"
+    if stamp.exists() and stamp.read_text() == install_hash:
+        ui.info("node_modules is up to date, skipping install")
+        return
+
+    tankerci.js.yarn_install_deps(cwd=cwd)
+    stamp.write_text(install_hash)
+
+
 def run_sdk_compat_tests() -> None:
     cwd = Path.cwd() / "ci/compat"
-    tankerci.js.yarn_install_deps(cwd=cwd)
+    yarn_install_deps(cwd=cwd)
     tankerci.js.run_yarn("proof", cwd=cwd)
 
 
 def get_package_path(package_name: str) -> Path:
-    m = re.match(r"^@tanker/(?:(datastore|stream)-)?(.*)$", package_name)
-    p = Path("packages")
+    m = _PACKAGE_RE.match(package_name)
     assert m
-    if m[1]:
-        p = p.joinpath(m[1])
-    return p.joinpath(m[2]).joinpath("dist")
+    return Path(os.path.join(_PACKAGES_DIR, m[1] or "", m[2], "dist"))
 
 
 def version_to_npm_tag(version: str) -> str:
-    for tag in ["alpha", "beta"]:
-        if tag in version:
-            return tag
+    m = _PRERELEASE_RE.search(version)
+    return m.group(1) if m else "latest"
 
-    return "latest"
 
-
-def publish_npm_package(package_name: str, version: str) -> None:
+def publish_npm_package(package_name: str, npm_tag: str) -> None:
     package_path = get_package_path(package_name)
-    npm_tag = version_to_npm_tag(version)
     tankerci.run(
         "npm", "publish", "--access", "public", "--tag", npm_tag, cwd=package_path
     )
@@ -163,64 +405,127 @@ def run_tests_in_node() -> None:
     tankerci.js.run_yarn("coverage")
 
 
-def check(*, runner: str, nightly: bool) -> None:
-    tankerci.js.yarn_install_deps()
+def check(*, runner: str, nightly: bool, parallel_rounds: int) -> None:
+    yarn_install_deps()
     if nightly:
-        run_tests_in_browser_ten_times(runner=runner)
-    elif runner == "node":
+        run_tests_in_browser_ten_times(runner=runner, parallel_rounds=parallel_rounds)
+    elif runner == "lint":
         run_linters()
+    elif runner == "node":
         run_tests_in_node()
     else:
         run_tests_in_browser(runner=runner)
 
 
 def compat() -> None:
-    tankerci.js.yarn_install_deps()
+    yarn_install_deps()
     run_sdk_compat_tests()
 
 
 def e2e(*, use_local_sources: bool) -> None:
+    # Only e2e needs conan, don't pay for its import in the other commands
+    import tankerci.conan
+
     if use_local_sources:
         base_path = Path.cwd().parent
     else:
         base_path = tankerci.git.prepare_sources(
             repos=["sdk-python", "sdk-js", "qa-python-js"]
         )
-    tankerci.conan.set_home_isolation()
-    tankerci.conan.update_config()
-    with tankerci.working_directory(base_path / "sdk-python"):
-        tankerci.run("poetry", "install", "--no-root")
-        tankerci.conan.install_tanker_source(
-            tankerci.conan.TankerSource.SAME_AS_BRANCH,
-            output_path=Path("conan") / "out",
-            profiles=["linux-release"],
-            update=False,
-            tanker_deployed_ref=None,
+    # sdk-js and sdk-python are set up independently, install sdk-js in the
+    # background. It must not rely on the current directory, which the
+    # sdk-python setup changes.
+    with concurrent.futures.ThreadPoolExecutor(max_workers=1) as executor:
+        sdk_js_setup = executor.submit(
+            tankerci.js.yarn_install, cwd=(base_path / "sdk-js").resolve()
         )
-        tankerci.run("poetry", "install")
-    with tankerci.working_directory(base_path / "sdk-js"):
-        tankerci.js.yarn_install()
+        tankerci.conan.set_home_isolation()
+        tankerci.conan.update_config()
+        with tankerci.working_directory(base_path / "sdk-python"):
+            tankerci.run("poetry", "install", "--no-root")
+            tankerci.conan.install_tanker_source(
+                tankerci.conan.TankerSource.SAME_AS_BRANCH,
+                output_path=Path("conan") / "out",
+                profiles=["linux-release"],
+                update=False,
+                tanker_deployed_ref=None,
+            )
+            tankerci.run("poetry", "install")
+        sdk_js_setup.result()
     with tankerci.working_directory(base_path / "qa-python-js"):
         tankerci.run("poetry", "install")
         tankerci.run("poetry", "run", "pytest", "--verbose", "--capture=no")
 
 
-def deploy_sdk(*, git_tag: str) -> None:
-    tankerci.js.yarn_install_deps()
+def start_builds(
+    configs: List[Dict[str, Any]], executor: concurrent.futures.Executor, *, jobs: int
+) -> Dict[str, concurrent.futures.Future]:
+    "Start every build as soon as the builds it depends on are done."
+    slots = threading.BoundedSemaphore(jobs)
+
+    def build(delivery: str, deps: List[concurrent.futures.Future]) -> None:
+        wait_for_futures(deps)
+        with slots:
+            try:
+                tankerci.js.yarn_build(delivery=delivery, env="prod")
+            except (Exception, SystemExit):
+                # Concurrent build outputs are interleaved, say which one failed
+                ui.error(f"Build of {delivery} failed")
+                raise
+
+    # Submit builds in topological order so that the futures of the
+    # dependencies of a build always exist when it is submitted
+    builds: Dict[str, concurrent.futures.Future] = {}
+    pending = list(configs)
+    while pending:
+        ready = [c for c in pending if all(dep in builds for dep in c["deps"])]
+        if not ready:
+            raise RuntimeError(
+                f"cyclic build dependencies: {[c['build'] for c in pending]}"
+            )
+        for config in ready:
+            builds[config["build"]] = executor.submit(
+                build, config["build"], [builds[dep] for dep in config["deps"]]
+            )
+            pending.remove(config)
+    return builds
+
+
+def deploy_sdk(*, git_tag: str, build_jobs: int) -> None:
+    yarn_install_deps()
     version = tankerci.bump.version_from_git_tag(git_tag)
     tankerci.bump.bump_files(version)
+    npm_tag = version_to_npm_tag(version)
 
-    # Publish packages in order so that dependencies don't break during deploy
-    configs = [
-        {"build": "global-this", "publish": ["@tanker/global-this"]},
-        {"build": "crypto", "publish": ["@tanker/crypto"]},
-        {"build": "errors", "publish": ["@tanker/errors"]},
-        {"build": "file-ponyfill", "publish": ["@tanker/file-ponyfill"]},
-        {"build": "file-reader", "publish": ["@tanker/file-reader"]},
-        {"build": "http-utils", "publish": ["@tanker/http-utils"]},
-        {"build": "types", "publish": ["@tanker/types"]},
+    # Publish packages in order so that dependencies don't break during deploy.
+    # "deps" lists the builds a build depends on.
+    configs: List[Dict[str, Any]] = [
+        {"build": "global-this", "deps": [], "publish": ["@tanker/global-this"]},
+        {"build": "crypto", "deps": ["errors"], "publish": ["@tanker/crypto"]},
+        {"build": "errors", "deps": [], "publish": ["@tanker/errors"]},
+        {
+            "build": "file-ponyfill",
+            "deps": ["global-this"],
+            "publish": ["@tanker/file-ponyfill"],
+        },
+        {
+            "build": "file-reader",
+            "deps": ["global-this"],
+            "publish": ["@tanker/file-reader"],
+        },
+        {
+            "build": "http-utils",
+            "deps": ["errors", "global-this"],
+            "publish": ["@tanker/http-utils"],
+        },
+        {
+            "build": "types",
+            "deps": ["crypto", "errors", "file-ponyfill", "file-reader", "global-this"],
+            "publish": ["@tanker/types"],
+        },
         {
             "build": "streams",
+            "deps": ["errors", "file-reader", "http-utils", "types"],
             "publish": [
                 "@tanker/stream-base",
                 "@tanker/stream-cloud-storage",
@@ -228,6 +533,7 @@ def deploy_sdk(*, git_tag: str) -> None:
         },
         {
             "build": "datastores",
+            "deps": ["crypto"],
             "publish": [
                 "@tanker/datastore-base",
                 "@tanker/datastore-dexie-base",
@@ -237,20 +543,71 @@ def deploy_sdk(*, git_tag: str) -> None:
                 "@tanker/datastore-pouchdb-node",
             ],
         },
-        {"build": "core", "publish": ["@tanker/core"]},
-        {"build": "client-browser", "publish": ["@tanker/client-browser"]},
-        {"build": "client-node", "publish": ["@tanker/client-node"]},
-        {"build": "verification-ui", "publish": ["@tanker/verification-ui"]},
-        {"build": "fake-authentication", "publish": ["@tanker/fake-authentication"]},
-        {"build": "filekit", "publish": ["@tanker/filekit"]},
+        {
+            "build": "core",
+            "deps": [
+                "crypto",
+                "datastores",
+                "errors",
+                "file-ponyfill",
+                "global-this",
+                "http-utils",
+                "streams",
+                "types",
+            ],
+            "publish": ["@tanker/core"],
+        },
+        {
+            "build": "client-browser",
+            "deps": ["core", "datastores"],
+            "publish": ["@tanker/client-browser"],
+        },
+        {
+            "build": "client-node",
+            "deps": ["core", "datastores"],
+            "publish": ["@tanker/client-node"],
+        },
+        {
+            "build": "verification-ui",
+            "deps": ["errors", "http-utils"],
+            "publish": ["@tanker/verification-ui"],
+        },
+        {
+            "build": "fake-authentication",
+            "deps": ["http-utils"],
+            "publish": ["@tanker/fake-authentication"],
+        },
+        {
+            "build": "filekit",
+            "deps": ["client-browser", "verification-ui"],
+            "publish": ["@tanker/filekit"],
+        },
     ]
 
-    for config in configs:
-        tankerci.js.yarn_build(delivery=config["build"], env="prod")  # type: ignore
-        for package_name in config["publish"]:
-            publish_npm_package(package_name, version)
-
-
+    # Builds run concurrently as soon as their dependencies are built, and a
+    # group is published as soon as it is built: publishing does not touch the
+    # dist folders of other packages. Packages of the same group don't depend
+    # on each other, so they are published concurrently, but a group is only
+    # published once the previous one is done.
+    max_workers = min(8, max(len(config["publish"]) for config in configs))
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers=len(configs)
+    ) as build_executor, concurrent.futures.ThreadPoolExecutor(
+        max_workers=max_workers
+    ) as publish_executor:
+        builds = start_builds(configs, build_executor, jobs=build_jobs)
+        publishes: List[concurrent.futures.Future] = []
+        for config in configs:
+            builds[config["build"]].result()
+            wait_for_futures(publishes)
+            publishes = [
+                publish_executor.submit(publish_npm_package, package_name, npm_tag)
+                for package_name in config["publish"]
+            ]
+        wait_for_futures(publishes)
+
+
+@functools.lru_cache(maxsize=None)
 def get_branch_name() -> str:
     branch = os.environ.get("CI_COMMIT_BRANCH", None)
     if not branch:
@@ -262,11 +619,17 @@ def get_branch_name() -> str:
     return cast(str, branch)
 
 
+@functools.lru_cache(maxsize=None)
+def get_commit_id() -> str:
+    _, commit_id = tankerci.git.run_captured(Path.cwd(), "rev-parse", "HEAD")
+    return cast(str, commit_id)
+
+
 def report_size() -> None:
     tankerci.reporting.assert_can_send_metrics()
 
     branch = get_branch_name()
-    _, commit_id = tankerci.git.run_captured(Path.cwd(), "rev-parse", "HEAD")
+    commit_id = get_commit_id()
 
     tankerci.run("yarn", "build:client-browser-umd")
     lib_path = Path("packages/client-browser/dist/umd/tanker-client-browser.min.js")
@@ -287,7 +650,7 @@ def benchmark(*, runner: str) -> None:
     tankerci.reporting.assert_can_send_metrics()
 
     branch = get_branch_name()
-    _, commit_id = tankerci.git.run_captured(Path.cwd(), "rev-parse", "HEAD")
+    commit_id = get_commit_id()
 
     if runner == "linux":
         tankerci.js.run_yarn("benchmark", "--browsers", "ChromeInDocker")
@@ -301,39 +664,53 @@ def benchmark(*, runner: str) -> None:
     else:
         raise RuntimeError(f"unsupported runner {runner}")
     benchmark_output = Path("benchmarks.json")
-    benchmark_results = json.loads(benchmark_output.read_text())
+    benchmark_results = json.loads(benchmark_output.read_bytes())
 
     hostname = os.environ.get("CI_RUNNER_DESCRIPTION", None)
     if not hostname:
         hostname = benchmark_results["context"]["host"]
 
-    for browser in benchmark_results["browsers"]:
-        # map the name to something more friendly
-        if browser["name"].startswith("Chrome Headless"):
-            browser_name = "chrome-headless"
-        elif browser["name"].startswith("Safari"):
-            browser_name = "safari"
-        elif browser["name"].startswith("Edge"):
-            browser_name = "edge"
-        else:
-            raise RuntimeError(f"unsupported browser {browser['name']}")
-
-        for benchmark in browser["benchmarks"]:
-            tankerci.reporting.send_metric(
-                f"benchmark",
-                tags={
-                    "project": "sdk-js",
-                    "branch": branch,
-                    "browser": browser_name,
-                    "scenario": benchmark["name"].lower(),
-                    "host": hostname,
-                },
-                fields={
-                    "real_time": benchmark["real_time"],
-                    "commit_id": commit_id,
-                    "browser_full_name": browser["name"],
-                },
-            )
+    # Each metric is its own HTTP request, send them concurrently
+    sends: List[concurrent.futures.Future] = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=8) as executor:
+        for browser in benchmark_results["browsers"]:
+            # map the name to something more friendly
+            if browser["name"].startswith("Chrome Headless"):
+                browser_name = "chrome-headless"
+            elif browser["name"].startswith("Safari"):
+                browser_name = "safari"
+            elif browser["name"].startswith("Edge"):
+                browser_name = "edge"
+            else:
+                raise RuntimeError(f"unsupported browser {browser['name']}")
+
+            for benchmark in browser["benchmarks"]:
+                send = executor.submit(
+                    tankerci.reporting.send_metric,
+                    f"benchmark",
+                    tags={
+                        "project": "sdk-js",
+                        "branch": branch,
+                        "browser": browser_name,
+                        "scenario": benchmark["name"].lower(),
+                        "host": hostname,
+                    },
+                    fields={
+                        "real_time": benchmark["real_time"],
+                        "commit_id": commit_id,
+                        "browser_full_name": browser["name"],
+                    },
+                )
+                sends.append(send)
+        wait_for_futures(sends)
+
+
+def run_benchmarks(*, runner: str) -> None:
+    tankerci.js.yarn_install()
+    if runner == "linux":
+        # size is the same on all platforms, we can track it only on linux
+        report_size()
+    benchmark(runner=runner)
 
 
 def _main() -> None:
@@ -343,38 +720,50 @@ def _main() -> None:
     check_parser = subparsers.add_parser("check")
     check_parser.add_argument("--nightly", action="store_true")
     check_parser.add_argument("--runner", required=True)
+    check_parser.add_argument(
+        "--parallel-rounds",
+        type=int,
+        default=2,
+        help="number of nightly rounds to run at once on linux",
+    )
+    check_parser.set_defaults(
+        func=lambda args: check(
+            runner=args.runner,
+            nightly=args.nightly,
+            parallel_rounds=args.parallel_rounds,
+        )
+    )
 
     deploy_parser = subparsers.add_parser("deploy")
     deploy_parser.add_argument("--git-tag", required=True)
+    deploy_parser.add_argument(
+        "--build-jobs",
+        type=int,
+        default=2,
+        help="number of deliveries to build at once",
+    )
+    deploy_parser.set_defaults(
+        func=lambda args: deploy_sdk(git_tag=args.git_tag, build_jobs=args.build_jobs)
+    )
 
-    subparsers.add_parser("compat")
+    compat_parser = subparsers.add_parser("compat")
+    compat_parser.set_defaults(func=lambda args: compat())
 
     e2e_parser = subparsers.add_parser("e2e")
     e2e_parser.add_argument("--use-local-sources", action="store_true", default=False)
+    e2e_parser.set_defaults(
+        func=lambda args: e2e(use_local_sources=args.use_local_sources)
+    )
 
     benchmark_parser = subparsers.add_parser("benchmark")
     benchmark_parser.add_argument("--runner", required=True)
+    benchmark_parser.set_defaults(func=lambda args: run_benchmarks(runner=args.runner))
 
     args = parser.parse_args()
-    if args.command == "check":
-        runner = args.runner
-        nightly = args.nightly
-        check(runner=runner, nightly=nightly)
-    elif args.command == "deploy":
-        deploy_sdk(git_tag=args.git_tag)
-    elif args.command == "compat":
-        compat()
-    elif args.command == "e2e":
-        e2e(use_local_sources=args.use_local_sources)
-    elif args.command == "benchmark":
-        tankerci.js.yarn_install()
-        if args.runner == "linux":
-            # size is the same on all platforms, we can track it only on linux
-            report_size()
-        benchmark(runner=args.runner)
-    else:
+    if not hasattr(args, "func"):
         parser.print_help()
         sys.exit(1)
+    args.func(args)
 
 
 def main():